@@ -143,17 +143,19 @@ def analyze_property():
                     (comps_data['price'] <= price * 1.2)
                 ].head(5)
                 
-                for _, comp in similar_comps.iterrows():
-                    comps.append({
-                        'address': comp.get('address', 'Unknown'),
-                        'price': float(comp.get('price', 0)),
-                        'beds': int(comp.get('beds', 0)),
-                        'baths': float(comp.get('baths', 0)),
-                        'sqft': float(comp.get('sqft', 0)),
-                        'pricePerSqft': float(comp.get('price', 0)) / float(comp.get('sqft', 1)) if comp.get('sqft', 0) > 0 else 0,
-                        'soldDate': comp.get('sale_date', 'Unknown'),
-                        'distance': 0.5  # Mock distance
-                    })
+                # Build the response columns at once instead of per-row dicts
+                comp_prices = similar_comps['price'].to_numpy(dtype=np.float64)
+                comp_sqft = similar_comps['sqft'].to_numpy(dtype=np.float64)
+                comps = pd.DataFrame({
+                    'address': similar_comps.get('address', 'Unknown'),
+                    'price': comp_prices,
+                    'beds': similar_comps['beds'].astype(int),
+                    'baths': similar_comps['baths'].to_numpy(dtype=np.float64),
+                    'sqft': comp_sqft,
+                    'pricePerSqft': np.divide(comp_prices, comp_sqft, out=np.zeros_like(comp_prices), where=comp_sqft > 0),
+                    'soldDate': similar_comps.get('sale_date', 'Unknown'),
+                    'distance': 0.5  # Mock distance
+                }).to_dict('records')
             except Exception as e:
                 print(f"Comps calculation failed: {e}")
         
@@ -201,9 +203,11 @@ def get_market_data():
                 'error': 'Market data not available'
             }), 400
         
-        # Calculate market statistics
-        avg_price = comps_data['price'].mean()
-        avg_price_per_sqft = (comps_data['price'] / comps_data['sqft']).mean()
+        # Calculate market statistics on the raw arrays
+        prices = comps_data['price'].to_numpy(dtype=np.float64)
+        sqft = comps_data['sqft'].to_numpy(dtype=np.float64)
+        avg_price = np.nanmean(prices)
+        avg_price_per_sqft = np.nanmean(prices / sqft)
         
         return jsonify({
             'success': True,
@@ -212,8 +216,8 @@ def get_market_data():
                 'avgPricePerSqft': float(avg_price_per_sqft),
                 'totalProperties': len(comps_data),
                 'priceRange': {
-                    'min': float(comps_data['price'].min()),
-                    'max': float(comps_data['price'].max())
+                    'min': float(np.nanmin(prices)),
+                    'max': float(np.nanmax(prices))
                 }
             }
         })
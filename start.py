@@ -38,14 +38,20 @@ def check_dependencies():
     return True
 
 def start_flask_api():
-    """Start the Flask API server."""
+    """Start the Flask API server in the background and return its process."""
     print("🚀 Starting Flask API server...")
     try:
-        subprocess.run([sys.executable, "api.py"], check=True)
-    except KeyboardInterrupt:
-        print("\n🛑 Flask API server stopped")
+        return subprocess.Popen([sys.executable, "api.py"])
     except Exception as e:
         print(f"❌ Error starting Flask API: {e}")
+        return None
+
+def stop_flask_api(flask_process):
+    """Stop the Flask API server started by start_flask_api."""
+    if flask_process.poll() is None:
+        flask_process.terminate()
+        flask_process.wait()
+        print("\n🛑 Flask API server stopped")
 
 def check_node_installed():
     """Check if Node.js is installed."""
@@ -93,22 +99,28 @@ def main():
         print("Then run this script again.")
         return
     
-    # Install React dependencies if needed
-    if not os.path.exists("node_modules"):
-        if not install_react_dependencies():
-            return
-    
     print("\n🎯 Starting the application...")
     print("\nThe application consists of two parts:")
     print("1. Flask API Backend (Port 5000)")
     print("2. React Frontend (Port 3000)")
     
-    # Start Flask API in a separate thread
-    flask_thread = Thread(target=start_flask_api, daemon=True)
-    flask_thread.start()
+    # Start Flask API in the background so it warms up during npm install
+    flask_process = start_flask_api()
+    if flask_process is None:
+        return
+    flask_started_at = time.time()
     
-    # Wait a moment for Flask to start
-    time.sleep(3)
+    # Install React dependencies if needed; don't leave the API holding port 5000 if that fails
+    if not os.path.exists("node_modules"):
+        if not install_react_dependencies():
+            stop_flask_api(flask_process)
+            return
+    
+    # Wait for Flask to start, minus any time already spent installing
+    time.sleep(max(0, 3 - (time.time() - flask_started_at)))
+    if flask_process.poll() is not None:
+        print("\n❌ Flask API exited during startup; see the errors above")
+        return
     
     print("\n✅ Flask API is running on http://localhost:5000")
     print("🌐 React app will start on http://localhost:3000")
@@ -124,8 +136,11 @@ def main():
     browser_thread = Thread(target=open_browser, daemon=True)
     browser_thread.start()
     
-    # Start React app
-    start_react_app()
+    # Start React app, and stop the API along with it
+    try:
+        start_react_app()
+    finally:
+        stop_flask_api(flask_process)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,66 +1,24 @@
-import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 import numpy as np
 import matplotlib.pyplot as plt
 from utils.ml_models import RentPredictor
-import os
-from pathlib import Path
+from utils.rent_data import load_rent_data
 
-# Load your Excel file (update path if needed)
-desktop_path = str(Path.home() / "Desktop")
-excel_path = os.path.join(desktop_path, 'Rent Data.xlsx')
-df = pd.read_excel(excel_path)
-
-# Rename columns to match model's expected format
-column_mapping = {
-    'Neighborhood': 'nbhd',
-    'Rent ($)': 'rent',
-    'Size (ft²)': 'FinishedSqft',
-    '$/ft²': 'price_per_sqft',
-    'Beds': 'Bedrooms',
-    'Baths': 'Bathrooms',
-    'Building Type': 'PropertyType',
-    'Last Seen': 'Sale_date',
-    'Zip-Code': 'zipcode'
-}
-df = df.rename(columns=column_mapping)
-
-# Convert numeric columns to proper types
-numeric_columns = ['rent', 'FinishedSqft', 'price_per_sqft', 'Bedrooms', 'Bathrooms']
-for col in numeric_columns:
-    if col in df.columns:
-        if col == 'price_per_sqft':
-            df[col] = df[col].astype(str).str.extract(r'([\d\.]+)').astype(float)
-        elif col == 'rent':
-            df[col] = df[col].astype(str).str.replace('$', '').str.replace(',', '').astype(float)
-        else:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-
-# Basic cleaning: keep rows with rent and at least one feature
-df = df[df['rent'].notna() & (
-    df['FinishedSqft'].notna() |
-    df['Bedrooms'].notna() |
-    df['Bathrooms'].notna() |
-    df['nbhd'].notna() |
-    df['PropertyType'].notna() |
-    df['zipcode'].notna()
-)]
+# Load the cleaned rent data (the same frame train_models trains on)
+df = load_rent_data()
 
 # Split into train and test
 train_df, test_df = train_test_split(df, test_size=0.2, random_state=42)
 
-# Prepare features and target
-feature_cols = ['FinishedSqft', 'Bedrooms', 'Bathrooms', 'nbhd', 'PropertyType', 'zipcode']
-X_train = train_df[feature_cols]
-y_train = train_df['rent']
-X_test = test_df[feature_cols]
-y_test = test_df['rent']
-
 # Train the model
 model = RentPredictor()
 model.train(train_df)
 
+# Prepare features and target
+X_test = model.prepare_features(test_df)
+y_test = test_df['rent']
+
 # Predict on the test set
 y_pred = [model.predict(row.to_dict()) for _, row in X_test.iterrows()]
 
@@ -1,90 +1,46 @@
 import pandas as pd
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import train_test_split, HalvingRandomSearchCV
 from sklearn.metrics import mean_absolute_error, mean_squared_error
-from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import OrdinalEncoder
 import numpy as np
 import os
-from pathlib import Path
-import matplotlib.pyplot as plt
 import warnings
 from xgboost import XGBRegressor
 import joblib
+from utils.rent_data import load_rent_data, trim_rent_outliers
 warnings.filterwarnings('ignore')
 
-# Load your Excel file
-excel_path = os.path.join(str(Path.home() / "Desktop"), 'Rent Data.xlsx')
-df = pd.read_excel(excel_path)
-
-# Rename columns to match model's expected format
-column_mapping = {
-    'Neighborhood': 'nbhd',
-    'Rent ($)': 'rent',
-    'Size (ft²)': 'FinishedSqft',
-    '$/ft²': 'price_per_sqft',
-    'Beds': 'Bedrooms',
-    'Baths': 'Bathrooms',
-    'Building Type': 'PropertyType',
-    'Last Seen': 'Sale_date',
-    'Zip-Code': 'zipcode'
-}
-df = df.rename(columns=column_mapping)
-
-# Convert numeric columns to proper types
-numeric_columns = ['rent', 'FinishedSqft', 'price_per_sqft', 'Bedrooms', 'Bathrooms']
-for col in numeric_columns:
-    if col in df.columns:
-        if col == 'price_per_sqft':
-            df[col] = df[col].astype(str).str.extract(r'([\d\.]+)').astype(float)
-        elif col == 'rent':
-            df[col] = df[col].astype(str).str.replace('$', '').str.replace(',', '').astype(float)
-        else:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-
-# Basic cleaning: keep rows with rent and at least one feature
-df = df[df['rent'].notna() & (
-    df['FinishedSqft'].notna() |
-    df['Bedrooms'].notna() |
-    df['Bathrooms'].notna() |
-    df['nbhd'].notna() |
-    df['PropertyType'].notna() |
-    df['zipcode'].notna()
-)]
+# Load the cleaned rent data (shares cleaning and the Parquet cache with train_models)
+df = load_rent_data(trim_outliers=False)
+
+# Rent histograms block until the window is closed, so only show them when asked (SHOW_PLOTS=1)
+show_plots = bool(os.environ.get('SHOW_PLOTS'))
+
+def plot_rent_distribution(df, tag, color):
+    """Show a histogram of the rent column"""
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(8,4))
+    plt.hist(df['rent'], bins=50, color=color, edgecolor='k')
+    plt.title(f'Rent Distribution ({tag})')
+    plt.xlabel('Rent')
+    plt.ylabel('Count')
+    plt.tight_layout()
+    plt.show()
 
 # Visualize rent distribution before outlier removal
-plt.figure(figsize=(8,4))
-plt.hist(df['rent'], bins=50, color='skyblue', edgecolor='k')
-plt.title('Rent Distribution (Before Outlier Removal)')
-plt.xlabel('Rent')
-plt.ylabel('Count')
-plt.tight_layout()
-plt.show()
+if show_plots:
+    plot_rent_distribution(df, 'Before Outlier Removal', 'skyblue')
 
 # Remove outliers: keep rents between 1st and 99th percentiles
-low, high = df['rent'].quantile([0.01, 0.99])
-df = df[(df['rent'] >= low) & (df['rent'] <= high)]
+df = trim_rent_outliers(df)
 
 # Visualize rent distribution after outlier removal
-plt.figure(figsize=(8,4))
-plt.hist(df['rent'], bins=50, color='lightgreen', edgecolor='k')
-plt.title('Rent Distribution (After Outlier Removal)')
-plt.xlabel('Rent')
-plt.ylabel('Count')
-plt.tight_layout()
-plt.show()
-
-# Feature engineering
-if 'Bedrooms' in df.columns and 'Bathrooms' in df.columns:
-    df['BedBath'] = df['Bedrooms'] * df['Bathrooms']
-if 'FinishedSqft' in df.columns and 'Bedrooms' in df.columns:
-    df['SqftPerBed'] = df['FinishedSqft'] / df['Bedrooms'].replace(0, np.nan)
-if 'FinishedSqft' in df.columns:
-    df['LogSqft'] = np.log1p(df['FinishedSqft'])
-if 'Sale_date' in df.columns:
-    df['SaleMonth'] = pd.to_datetime(df['Sale_date'], errors='coerce').dt.month
+if show_plots:
+    plot_rent_distribution(df, 'After Outlier Removal', 'lightgreen')
 
 # Update feature columns
 feature_cols = ['FinishedSqft', 'Bedrooms', 'Bathrooms', 'nbhd', 'PropertyType', 'zipcode',
@@ -94,35 +50,36 @@ feature_cols = [col for col in feature_cols if col in df.columns]
 # Split into train and test sets (after all cleaning/engineering)
 train_df, test_df = train_test_split(df, test_size=0.2, random_state=42)
 X_train = train_df[feature_cols]
-y_train = train_df['rent']
 X_test = test_df[feature_cols]
-y_test = test_df['rent']
+# Materialize the targets once so the CV splits index plain arrays;
+# X stays a DataFrame because the category dtypes carry the categorical features
+y_train = train_df['rent'].to_numpy(dtype=np.float32)
+y_test = test_df['rent'].to_numpy(dtype=np.float32)
 
 # Preprocessing pipeline
 numeric_features = [col for col in ['FinishedSqft', 'Bedrooms', 'Bathrooms', 'BedBath', 'SqftPerBed', 'LogSqft', 'SaleMonth'] if col in X_train.columns]
 categorical_features = [col for col in ['nbhd', 'PropertyType', 'zipcode'] if col in X_train.columns]
 
-numeric_transformer = Pipeline(steps=[
-    ('imputer', SimpleImputer(strategy='median')),
-    ('scaler', StandardScaler())
-])
-
-categorical_transformer = Pipeline(steps=[
-    ('imputer', SimpleImputer(strategy='most_frequent')),
-    ('onehot', OneHotEncoder(handle_unknown='ignore'))
-])
-
-preprocessor = ColumnTransformer(
+# HistGradientBoosting takes categories as small integer codes and handles missing values itself;
+# unseen and missing categories are encoded as -1, which it treats as missing
+hgb_preprocessor = ColumnTransformer(
     transformers=[
-        ('num', numeric_transformer, numeric_features),
-        ('cat', categorical_transformer, categorical_features)
-    ]
-)
-
-# Try XGBoostRegressor in the same pipeline
+        ('num', 'passthrough', numeric_features),
+        ('cat', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1,
+                               encoded_missing_value=-1, max_categories=255), categorical_features)
+    ],
+    verbose_feature_names_out=False
+).set_output(transform='pandas')
+
+# Only the regressor hyperparameters are searched, so cache the fitted preprocessor
+# per CV fold instead of refitting it for every candidate
+pipeline_cache = joblib.Memory('.sk_cache', verbose=0)
+
+# Try XGBoostRegressor with histogram split finding; it handles missing values and
+# pandas category columns natively, so the features go in without a preprocessor
 pipe_xgb = Pipeline([
-    ('preprocessor', preprocessor),
-    ('regressor', XGBRegressor(objective='reg:squarederror', random_state=42, n_jobs=-1, verbosity=0))
+    ('regressor', XGBRegressor(objective='reg:squarederror', tree_method='hist', enable_categorical=True,
+                               random_state=42, n_jobs=-1, verbosity=0))
 ])
 
 param_dist_xgb = {
@@ -134,10 +91,15 @@ param_dist_xgb = {
     'regressor__colsample_bytree': [0.7, 0.9, 1.0]
 }
 
-search_xgb = RandomizedSearchCV(
+# Successive halving scores every candidate on a small sample and only promotes the best
+# third to the next, larger round; the last round uses the whole training set
+search_xgb = HalvingRandomSearchCV(
     pipe_xgb,
     param_distributions=param_dist_xgb,
-    n_iter=20,
+    n_candidates=40,
+    factor=3,
+    resource='n_samples',
+    min_resources='exhaust',
     cv=5,
     scoring='neg_mean_absolute_error',
     verbose=2,
@@ -152,14 +114,11 @@ print(search_xgb.best_params_)
 
 # Feature importances for XGBoost
 importances_xgb = search_xgb.best_estimator_.named_steps['regressor'].feature_importances_
-feature_names_xgb = (
-    list(search_xgb.best_estimator_.named_steps['preprocessor'].transformers_[0][2]) +
-    list(search_xgb.best_estimator_.named_steps['preprocessor'].transformers_[1][1].named_steps['onehot'].get_feature_names_out(categorical_features))
-)
-importance_df_xgb = pd.DataFrame({'Feature': feature_names_xgb, 'Importance': importances_xgb})
-importance_df_xgb = importance_df_xgb.sort_values('Importance', ascending=False)
+# The regressor sees the feature columns as-is, so they are its feature names
+feature_names_xgb = feature_cols
+importance_df_xgb = pd.DataFrame({'Feature': feature_names_xgb, 'Importance': importances_xgb}).nlargest(10, 'Importance')
 print("\n[XGBoost] Top 10 Feature Importances:")
-print(importance_df_xgb.head(10))
+print(importance_df_xgb)
 
 # Evaluate XGBoost on the untouched test set
 y_pred_xgb = search_xgb.best_estimator_.predict(X_test)
@@ -177,31 +136,26 @@ if abs(mae_xgb - cv_mae_xgb) / cv_mae_xgb < 0.2:
 else:
     print("[XGBoost] Warning: Possible overfitting (test MAE is much higher than cross-validated MAE).")
 
-# Compare cross-validated MAE to test MAE for GradientBoostingRegressor
-cv_mae = -search.best_score_
-print(f"Best cross-validated MAE: {cv_mae:.2f}")
-print(f"Test MAE: {mae:.2f}")
-if abs(mae - cv_mae) / cv_mae < 0.2:
-    print("Model is NOT overfitting (test MAE is close to cross-validated MAE).")
-else:
-    print("Warning: Possible overfitting (test MAE is much higher than cross-validated MAE).")
-
-# After evaluating GradientBoostingRegressor, save the best estimator
+# Tune HistGradientBoostingRegressor (histogram splits, multithreaded, native categoricals)
 pipe_gb = Pipeline([
-    ('preprocessor', preprocessor),
-    ('regressor', GradientBoostingRegressor(random_state=42))
-])
+    ('preprocessor', hgb_preprocessor),
+    ('regressor', HistGradientBoostingRegressor(categorical_features=categorical_features, random_state=42))
+], memory=pipeline_cache)
 param_dist_gb = {
-    'regressor__n_estimators': [100, 200, 300, 400],
+    'regressor__max_iter': [100, 200, 300, 400],
     'regressor__max_depth': [3, 5, 7, 9, 12],
     'regressor__learning_rate': [0.01, 0.03, 0.05, 0.1, 0.2],
-    'regressor__min_samples_split': [2, 5, 10],
-    'regressor__min_samples_leaf': [1, 2, 4]
+    'regressor__max_leaf_nodes': [15, 31, 63],
+    'regressor__min_samples_leaf': [1, 2, 4, 10, 20],
+    'regressor__l2_regularization': [0.0, 0.1, 1.0]
 }
-search_gb = RandomizedSearchCV(
+search_gb = HalvingRandomSearchCV(
     pipe_gb,
     param_distributions=param_dist_gb,
-    n_iter=20,
+    n_candidates=40,
+    factor=3,
+    resource='n_samples',
+    min_resources='exhaust',
     cv=5,
     scoring='neg_mean_absolute_error',
     verbose=2,
@@ -211,7 +165,25 @@ search_gb = RandomizedSearchCV(
 search_gb.fit(X_train, y_train)
 print("\n[GBR] Best Parameters:")
 print(search_gb.best_params_)
-# Save the best GradientBoostingRegressor pipeline
+
+# Evaluate HistGradientBoostingRegressor on the untouched test set
+y_pred_gb = search_gb.best_estimator_.predict(X_test)
+mae_gb = mean_absolute_error(y_test, y_pred_gb)
+rmse_gb = np.sqrt(mean_squared_error(y_test, y_pred_gb))
+print(f"\n[GBR] Test MAE: {mae_gb:.2f}")
+print(f"[GBR] Test RMSE: {rmse_gb:.2f}")
+
+# Compare cross-validated MAE to test MAE for HistGradientBoostingRegressor
+cv_mae_gb = -search_gb.best_score_
+print(f"[GBR] Best cross-validated MAE: {cv_mae_gb:.2f}")
+print(f"[GBR] Test MAE: {mae_gb:.2f}")
+if abs(mae_gb - cv_mae_gb) / cv_mae_gb < 0.2:
+    print("[GBR] Model is NOT overfitting (test MAE is close to cross-validated MAE).")
+else:
+    print("[GBR] Warning: Possible overfitting (test MAE is much higher than cross-validated MAE).")
+
+# Save the best HistGradientBoostingRegressor pipeline
 os.makedirs('models', exist_ok=True)
-joblib.dump(search_gb.best_estimator_, 'models/rent_predictor.joblib')
-print("\nSaved best GradientBoostingRegressor model to models/rent_predictor.joblib") 
\ No newline at end of file
+# lz4 keeps the tree arrays small on disk and decompresses faster than zlib on load
+joblib.dump(search_gb.best_estimator_, 'models/rent_predictor.joblib', compress=('lz4', 3))
+print("\nSaved best HistGradientBoostingRegressor model to models/rent_predictor.joblib") 
\ No newline at end of file
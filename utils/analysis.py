@@ -26,75 +26,101 @@ def estimate_rent_by_comps(property_data, comps_data):
         return estimated_rent
     return None
 
+def build_foreclosure_rates(foreclosure_data):
+    """Index foreclosure rates by zip code (first row wins for repeated zips)"""
+    return foreclosure_data.drop_duplicates('zip_code').set_index('zip_code')['foreclosure_rate']
+
 def calculate_risk_score(property_data, foreclosure_data):
-    """Calculate risk score based on foreclosure data"""
+    """Calculate risk score based on foreclosure data or a build_foreclosure_rates lookup"""
     if foreclosure_data is not None:
         zip_code = property_data.get('zip_code')
-        if zip_code in foreclosure_data['zip_code'].values:
-            foreclosure_rate = foreclosure_data[
-                foreclosure_data['zip_code'] == zip_code
-            ]['foreclosure_rate'].iloc[0]
+        if isinstance(foreclosure_data, pd.Series):
+            foreclosure_rate = foreclosure_data.get(zip_code)
+        else:
+            # One scan of the raw columns; callers scoring many properties should pass the
+            # build_foreclosure_rates lookup instead
+            rates = foreclosure_data['foreclosure_rate'].to_numpy()[foreclosure_data['zip_code'].to_numpy() == zip_code]
+            foreclosure_rate = rates[0] if len(rates) else None
+        if foreclosure_rate is not None:
             risk_score = 100 - (foreclosure_rate * 100)
             return risk_score
     return None
 
-def predict_property_value(property_data, model_data):
-    """Predict property value using the Milwaukee dataset model"""
+def calculate_risk_scores(zip_codes, foreclosure_rates):
+    """Calculate risk scores for many zip codes at once (NaN for unknown zips)"""
+    return 100 - foreclosure_rates.reindex(zip_codes).to_numpy() * 100
+
+# Feature order used by the Milwaukee property value model
+VALUE_FEATURES = ['sqft', 'beds', 'baths', 'year_built', 'lot_size']
+
+def build_value_model(model_data):
+    """Fit the property value model once on the Milwaukee training split"""
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(model_data['X_train'][VALUE_FEATURES])
+    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model.fit(X_train_scaled, model_data['y_train'])
+    return scaler, model
+
+def predict_property_value(property_data, value_model):
+    """Predict property value for a property dict, or values for a DataFrame of properties"""
     try:
-        # Prepare features
-        features = pd.DataFrame({
-            'sqft': [property_data['sqft']],
-            'beds': [property_data['beds']],
-            'baths': [property_data['baths']],
-            'year_built': [property_data['year_built']],
-            'lot_size': [property_data['lot_size']]
-        })
-        
-        # Scale features
-        scaler = StandardScaler()
-        features_scaled = scaler.fit_transform(features)
+        scaler, model = value_model
+        is_batch = isinstance(property_data, pd.DataFrame)
+        features = property_data if is_batch else pd.DataFrame([property_data])
         
-        # Make prediction
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
-        model.fit(model_data['X_train'], model_data['y_train'])
-        predicted_value = model.predict(features_scaled)[0]
+        # Scale with the training statistics and predict all rows in one call
+        predicted_values = model.predict(scaler.transform(features[VALUE_FEATURES]))
         
-        return predicted_value
+        return predicted_values if is_batch else predicted_values[0]
     except Exception as e:
         print(f"Error predicting property value: {str(e)}")
         return None
 
+# Simplified development cost used by the land feasibility estimate
+DEVELOPMENT_COST_PER_SQFT = 150  # Example value
+
+def _to_float_array(values, length):
+    """Coerce numbers or strings like '$1,250' to a float array, using 0 for missing/invalid values"""
+    if values is None:
+        return np.zeros(length)
+    if not pd.api.types.is_numeric_dtype(values):
+        values = values.astype(str).str.replace(r'[,$\s]', '', regex=True)
+    return pd.to_numeric(values, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+def calculate_land_feasibility_batch(props_df, comps_data):
+    """Calculate land development feasibility for a DataFrame of properties (NaN rows lack sqft or price)"""
+    if comps_data.empty:
+        return None
+    
+    sqft = _to_float_array(props_df.get('sqft'), len(props_df))
+    price = _to_float_array(props_df.get('price'), len(props_df))
+    valid = (sqft != 0) & (price != 0)
+    
+    # Calculate average price per square foot of developed land
+    avg_price_per_sqft = comps_data['price'].mean() / comps_data['sqft'].mean()
+    # Estimate development costs (simplified)
+    total_development_cost = sqft * DEVELOPMENT_COST_PER_SQFT
+    # Calculate potential profit
+    potential_value = sqft * avg_price_per_sqft
+    potential_profit = potential_value - price - total_development_cost
+    roi = np.divide(potential_profit, price, out=np.zeros_like(price), where=price != 0) * 100
+    
+    results = pd.DataFrame({
+        'potential_value': potential_value,
+        'development_cost': total_development_cost,
+        'potential_profit': potential_profit,
+        'roi': roi
+    }, index=props_df.index)
+    results[~valid] = np.nan
+    return results
+
 def calculate_land_feasibility(property_data, comps_data):
     """Calculate land development feasibility with robust input validation"""
-    def safe_float(val, default=0.0):
-        try:
-            if val is None:
-                return default
-            if isinstance(val, (int, float)):
-                return float(val)
-            s = str(val).replace(",", "").replace("$", "").strip()
-            return float(s)
-        except Exception:
-            return default
-
-    if not comps_data.empty:
-        sqft = safe_float(property_data.get('sqft'), 0)
-        price = safe_float(property_data.get('price'), 0)
-        if sqft == 0 or price == 0:
-            return None  # Or optionally return a dict with an error message
-        # Calculate average price per square foot of developed land
-        avg_price_per_sqft = comps_data['price'].mean() / comps_data['sqft'].mean()
-        # Estimate development costs (simplified)
-        development_cost_per_sqft = 150  # Example value
-        total_development_cost = sqft * development_cost_per_sqft
-        # Calculate potential profit
-        potential_value = sqft * avg_price_per_sqft
-        current_value = price
-        potential_profit = potential_value - current_value - total_development_cost
-        return {
-            'potential_value': potential_value,
-            'development_cost': total_development_cost,
-            'potential_profit': potential_profit,
-            'roi': (potential_profit / current_value) * 100 if current_value else 0
-        }
-    return None 
\ No newline at end of file
+    results = calculate_land_feasibility_batch(pd.DataFrame([property_data]), comps_data)
+    if results is None:
+        return None
+    result = results.iloc[0]
+    # Development cost is only NaN when sqft or price is missing or zero
+    if np.isnan(result['development_cost']):
+        return None  # Or optionally return a dict with an error message
+    return result.to_dict()
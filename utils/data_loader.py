@@ -2,74 +2,73 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import functools
+from utils.analysis import build_foreclosure_rates
 
 def load_milwaukee_dataset():
     """Load and prepare the Milwaukee real estate dataset"""
-    try:
-        # In a real implementation, you would load this from a file
-        # For now, we'll create a sample dataset
-        data = {
-            'price': np.random.normal(300000, 50000, 1000),
-            'sqft': np.random.normal(2000, 500, 1000),
-            'beds': np.random.randint(1, 6, 1000),
-            'baths': np.random.randint(1, 4, 1000),
-            'year_built': np.random.randint(1950, 2024, 1000),
-            'lot_size': np.random.normal(5000, 1000, 1000)
-        }
-        df = pd.DataFrame(data)
-        
-        # Prepare features and target
-        X = df[['sqft', 'beds', 'baths', 'year_built', 'lot_size']]
-        y = df['price']
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-        
-        return {
-            'X_train': X_train,
-            'X_test': X_test,
-            'y_train': y_train,
-            'y_test': y_test,
-            'data': df
-        }
-    except Exception as e:
-        print(f"Error loading Milwaukee dataset: {str(e)}")
-        return None
+    # In a real implementation, you would load this from a file
+    # For now, we'll create a sample dataset
+    rng = np.random.default_rng(42)
+    data = {
+        'price': rng.normal(300000, 50000, 1000),
+        'sqft': rng.normal(2000, 500, 1000),
+        'beds': rng.integers(1, 6, 1000),
+        'baths': rng.integers(1, 4, 1000),
+        'year_built': rng.integers(1950, 2024, 1000),
+        'lot_size': rng.normal(5000, 1000, 1000)
+    }
+    df = pd.DataFrame(data, copy=False)
+    
+    # Prepare features and target
+    X = df[['sqft', 'beds', 'baths', 'year_built', 'lot_size']]
+    y = df['price']
+    
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+    
+    return {
+        'X_train': X_train,
+        'X_test': X_test,
+        'y_train': y_train,
+        'y_test': y_test,
+        'data': df
+    }
 
 def load_foreclosure_data():
     """Load foreclosure data"""
-    try:
-        # In a real implementation, you would load this from a file
-        # For now, we'll create a sample dataset
-        data = {
-            'zip_code': np.random.randint(10000, 99999, 100),
-            'foreclosure_rate': np.random.uniform(0, 0.1, 100)
-        }
-        return pd.DataFrame(data)
-    except Exception as e:
-        print(f"Error loading foreclosure data: {str(e)}")
-        return None
+    # In a real implementation, you would load this from a file
+    # For now, we'll create a sample dataset
+    rng = np.random.default_rng(43)
+    data = {
+        'zip_code': rng.integers(10000, 99999, 100),
+        'foreclosure_rate': rng.uniform(0, 0.1, 100)
+    }
+    return pd.DataFrame(data, copy=False)
+
+@functools.lru_cache(maxsize=1)
+def load_foreclosure_rates():
+    """Foreclosure rates indexed by zip code, built once for calculate_risk_score lookups"""
+    return build_foreclosure_rates(load_foreclosure_data())
 
 def load_comps_data():
     """Load comparable properties data"""
-    try:
-        # In a real implementation, you would load this from a file
-        # For now, we'll create a sample dataset
-        data = {
-            'price': np.random.normal(300000, 50000, 100),
-            'rent': np.random.normal(2000, 500, 100),
-            'sqft': np.random.normal(2000, 500, 100),
-            'beds': np.random.randint(1, 6, 100),
-            'baths': np.random.randint(1, 4, 100),
-            'year_built': np.random.randint(1950, 2024, 100),
-            'lot_size': np.random.normal(5000, 1000, 100)
-        }
-        return pd.DataFrame(data)
-    except Exception as e:
-        print(f"Error loading comps data: {str(e)}")
-        return None
+    # In a real implementation, you would load this from a file
+    # For now, we'll create a sample dataset
+    rng = np.random.default_rng(44)
+    data = {
+        'price': rng.normal(300000, 50000, 100),
+        'rent': rng.normal(2000, 500, 100),
+        'sqft': rng.normal(2000, 500, 100),
+        'beds': rng.integers(1, 6, 100),
+        'baths': rng.integers(1, 4, 100),
+        'year_built': rng.integers(1950, 2024, 100),
+        'lot_size': rng.normal(5000, 1000, 100)
+    }
+    return pd.DataFrame(data, copy=False)
 
 def save_analysis_results(results, filename):
     """Save analysis results to a file"""
@@ -89,36 +88,51 @@ def load_analysis_results(filename):
         print(f"Error loading analysis results: {str(e)}")
         return None
 
+# Yearly sales files and the columns the comps pipeline uses from them
+SALES_FILES = [
+    'data/2019-property-sales-data.csv',
+    'data/2020-property-sales-data.csv',
+    'data/2021-property-sales-data.csv',
+    'data/2022-property-sales-data.csv',
+]
+SALES_COLUMNS = [
+    'PropType', 'nbhd', 'Year_Built', 'FinishedSqft', 'Bdrms',
+    'Fbath', 'Hbath', 'Lotsize', 'Sale_date', 'Sale_price'
+]
+
+# Columns that are clean numbers in every yearly file, parsed straight to float32
+SALES_DTYPES = {'Bdrms': 'float32', 'Fbath': 'float32', 'Hbath': 'float32', 'Year_Built': 'float32'}
+
 def load_and_clean_sales_data():
-    files = [
-        'data/2019-property-sales-data.csv',
-        'data/2020-property-sales-data.csv',
-        'data/2021-property-sales-data.csv',
-        'data/2022-property-sales-data.csv',
-    ]
-    dfs = []
-    for f in files:
-        df = pd.read_csv(f)
-        dfs.append(df)
+    # The yearly files are independent, so parse them concurrently
+    with ThreadPoolExecutor(max_workers=len(SALES_FILES)) as executor:
+        dfs = list(executor.map(
+            lambda f: pd.read_csv(f, usecols=SALES_COLUMNS, dtype=SALES_DTYPES), SALES_FILES
+        ))
     df = pd.concat(dfs, ignore_index=True)
-    # Convert to numeric
-    df['FinishedSqft'] = pd.to_numeric(df['FinishedSqft'], errors='coerce')
-    df['Sale_price'] = pd.to_numeric(df['Sale_price'], errors='coerce')
-    # Drop rows with missing or 0 FinishedSqft or Sale_price
-    df = df.dropna(subset=['FinishedSqft', 'Sale_price', 'Sale_date'])
-    df = df[(df['FinishedSqft'] > 0) & (df['Sale_price'] > 0)]
-    # Ensure Sale_date is datetime
-    df['Sale_date'] = pd.to_datetime(df['Sale_date'], errors='coerce')
-    df = df.dropna(subset=['Sale_date'])
-    # Add price_per_sqft
-    df['price_per_sqft'] = df['Sale_price'] / df['FinishedSqft']
-    # Extract year
-    df['year'] = df['Sale_date'].dt.year
-    # Add columns for model compatibility
-    df['sqft'] = df['FinishedSqft']
-    df['beds'] = df['Bdrms']
-    df['baths'] = df['Fbath'].fillna(0) + df['Hbath'].fillna(0)
-    df['year_built'] = df['Year_Built']
-    df['lot_size'] = df['Lotsize']
-    df['price'] = df['Sale_price']
-    return df 
\ No newline at end of file
+    # Some years store these as formatted text (e.g. '$357,000'), which coerces to NaN
+    sqft = pd.to_numeric(df['FinishedSqft'], errors='coerce').to_numpy(dtype=np.float64)
+    price = pd.to_numeric(df['Sale_price'], errors='coerce').to_numpy(dtype=np.float64)
+    sale_date = pd.to_datetime(df['Sale_date'], errors='coerce')
+    # Keep rows with positive FinishedSqft and Sale_price and a valid Sale_date in one pass
+    mask = (sqft > 0) & (price > 0) & sale_date.notna().to_numpy()
+    sqft, price, sale_date = sqft[mask], price[mask], sale_date[mask]
+    # Rename to the model-compatible columns instead of keeping aliased copies
+    df = df.loc[mask].rename(columns={
+        'FinishedSqft': 'sqft',
+        'Bdrms': 'beds',
+        'Sale_price': 'price',
+        'Year_Built': 'year_built',
+        'Lotsize': 'lot_size'
+    })
+    df = df.assign(
+        sqft=sqft.astype(np.float32),
+        price=price.astype(np.float32),
+        Sale_date=sale_date,
+        baths=df['Fbath'].fillna(0).to_numpy() + df['Hbath'].fillna(0).to_numpy(),
+        price_per_sqft=price / sqft,
+        year=sale_date.dt.year
+    )
+    for col in ['nbhd', 'PropType']:
+        df[col] = df[col].astype('category')
+    return df
@@ -1,21 +1,85 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn import config_context
+from sklearn.model_selection import train_test_split, GridSearchCV, KFold, cross_val_score
+from sklearn.preprocessing import StandardScaler, OrdinalEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.impute import SimpleImputer
 import joblib
 import os
 
+# Rent MAE used for the confidence range until a model is trained (or when a saved model lacks one)
+DEFAULT_RENT_MAE = 289.24
+
+def tune_hyperparameters(estimator_class, suggest_params, X, y, n_trials=20, score=None, **fixed_params):
+    """Bayesian (TPE) search for the estimator's hyperparameters, scored by 5-fold CV MAE
+    (or by score(trial, params) when given; parameters it picks itself go in the trial's user attrs)"""
+    import optuna  # only needed when tuning
+    
+    def objective(trial):
+        params = suggest_params(trial)
+        if score is not None:
+            return score(trial, params)
+        estimator = estimator_class(**params, **fixed_params)
+        scores = cross_val_score(estimator, X, y, cv=5, scoring='neg_mean_absolute_error', n_jobs=-1)
+        return -scores.mean()
+    
+    study = optuna.create_study(direction='minimize', sampler=optuna.samplers.TPESampler(seed=42))
+    study.optimize(objective, n_trials=n_trials)
+    return {**study.best_params, **study.best_trial.user_attrs}
+
+def forest_cv_mae(X, y, n_estimators_grid, cv=5, **fixed_params):
+    """Scorer giving the CV MAE of a RandomForestRegressor at its best tree count in n_estimators_grid
+    
+    Each fold grows a single warm_start forest up the grid, scoring the new trees at every step,
+    instead of fitting a fresh forest per tree count; the best count is set as the trial's
+    n_estimators user attr.
+    """
+    X, y = np.asarray(X), np.asarray(y)
+    folds = list(KFold(n_splits=cv).split(X))
+    
+    def score(trial, params):
+        maes = np.empty((len(folds), len(n_estimators_grid)))
+        for i, (train_idx, test_idx) in enumerate(folds):
+            forest = RandomForestRegressor(**params, warm_start=True, **fixed_params)
+            prediction_sum = np.zeros(len(test_idx))
+            for j, n_estimators in enumerate(n_estimators_grid):
+                n_grown = len(getattr(forest, 'estimators_', []))
+                forest.set_params(n_estimators=n_estimators).fit(X[train_idx], y[train_idx])
+                # The forest predicts the mean of its trees, so only the new trees need predicting
+                prediction_sum += sum(tree.predict(X[test_idx]) for tree in forest.estimators_[n_grown:])
+                maes[i, j] = mean_absolute_error(y[test_idx], prediction_sum / n_estimators)
+        
+        cv_maes = maes.mean(axis=0)
+        best = int(np.argmin(cv_maes))
+        trial.set_user_attr('n_estimators', n_estimators_grid[best])
+        return cv_maes[best]
+    
+    return score
+
+def target_strata(y, test_size=0.2, q=10):
+    """Decile bins of the target for a stratified split, or None when the data is too small to stratify"""
+    bins = pd.qcut(y, q=q, labels=False, duplicates='drop')
+    counts = bins.value_counts()
+    n_test = int(np.ceil(test_size * len(y)))
+    if counts.min() < 2 or n_test < len(counts) or len(y) - n_test < len(counts):
+        return None
+    return bins
+
 class PropertyPricePredictor:
     def __init__(self):
         self.model = None
         self.preprocessor = None
+        self._feature_names_ = None  # Output feature names of the fitted preprocessor
         self.feature_columns = None
         self.target_column = 'Sale_price'
+        self.best_params = None
+        self.serving_model = None  # Smaller forest distilled from self.model for predictions
+        self._onnx_session = None  # ONNX Runtime session for the serving model, when exported
         
     def prepare_features(self, df):
         """Prepare features for the model"""
@@ -26,7 +90,7 @@ class PropertyPricePredictor:
         ]
         
         # Create feature matrix
-        X = df[features].copy()
+        X = df[features]
         
         return X
     
@@ -40,96 +104,179 @@ class PropertyPricePredictor:
             ('scaler', StandardScaler())
         ])
         
+        # Trees split ordinal codes fine, so each categorical stays a single column instead of
+        # one-hot columns per zipcode/neighborhood; unseen categories are encoded as -1
         categorical_transformer = Pipeline(steps=[
             ('imputer', SimpleImputer(strategy='most_frequent')),  # Fill missing categorical values with most frequent
-            ('onehot', OneHotEncoder(handle_unknown='ignore'))
+            ('ordinal', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1))
         ])
         
         preprocessor = ColumnTransformer(
             transformers=[
                 ('num', numeric_transformer, numeric_features),
                 ('cat', categorical_transformer, categorical_features)
-            ])
+            ],
+            verbose_feature_names_out=False)
         
         return preprocessor
     
-    def train(self, df):
-        """Train the price prediction model"""
+    @staticmethod
+    def _suggest_params(trial):
+        """Random forest search space for tune_hyperparameters (forest_cv_mae picks n_estimators)"""
+        return {
+            'max_depth': trial.suggest_int('max_depth', 5, 25),
+            'min_samples_split': trial.suggest_int('min_samples_split', 2, 10),
+            'min_samples_leaf': trial.suggest_int('min_samples_leaf', 1, 5)
+        }
+    
+    def train(self, df, tune=False):
+        """Train the price prediction model and return the serving model's test MAE, RMSE and R2 (tune=True searches hyperparameters first)"""
+        # An ONNX session from load_model or export_onnx belongs to the previous model
+        self._onnx_session = None
+        
         # Prepare features
         X = self.prepare_features(df)
         y = df[self.target_column]
         
-        # Create and fit preprocessor
+        # Create and fit preprocessor; the forest works in float32, so cast once here
+        # instead of on every fit and predict
         self.preprocessor = self.create_preprocessor(X)
-        X_processed = self.preprocessor.fit_transform(X)
+        X_processed = self.preprocessor.fit_transform(X).astype(np.float32, copy=False)
+        self._feature_names_ = self.preprocessor.get_feature_names_out()
         
-        # Split data
+        # Split data, stratified on target deciles (when there are enough rows) so both splits
+        # cover the whole target range
         X_train, X_test, y_train, y_test = train_test_split(
-            X_processed, y, test_size=0.2, random_state=42
+            X_processed, y, test_size=0.2, random_state=42,
+            stratify=target_strata(y)
         )
         
-        # Initialize and train model
-        self.model = RandomForestRegressor(
-            n_estimators=200,
-            max_depth=15,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=42
-        )
+        # Initialize and train model, searching the hyperparameters on the training split if asked
+        if tune:
+            self.best_params = tune_hyperparameters(RandomForestRegressor, self._suggest_params, X_train, y_train,
+                                                    score=forest_cv_mae(X_train, y_train, list(range(100, 501, 50)),
+                                                                        n_jobs=-1, random_state=42))
+        else:
+            self.best_params = {
+                'n_estimators': 200,
+                'max_depth': 15,
+                'min_samples_split': 5,
+                'min_samples_leaf': 2
+            }
+        self.model = RandomForestRegressor(**self.best_params, n_jobs=-1, random_state=42)
         
         self.model.fit(X_train, y_train)
         
-        # Evaluate model
+        # Evaluate the full forest
         y_pred = self.model.predict(X_test)
-        mae = mean_absolute_error(y_test, y_pred)
-        rmse = np.sqrt(mean_squared_error(y_test, y_pred))
-        r2 = r2_score(y_test, y_pred)
-        
-        print(f"Model Performance:")
-        print(f"MAE: ${mae:,.2f}")
-        print(f"RMSE: ${rmse:,.2f}")
-        print(f"R2 Score: {r2:.3f}")
+        print(f"Full Forest Performance:")
+        print(f"MAE: ${mean_absolute_error(y_test, y_pred):,.2f}")
+        print(f"RMSE: ${np.sqrt(mean_squared_error(y_test, y_pred)):,.2f}")
+        print(f"R2 Score: {r2_score(y_test, y_pred):.3f}")
         
         # Print feature importance
-        feature_names = (self.preprocessor.named_transformers_['num'].get_feature_names_out().tolist() +
-                        self.preprocessor.named_transformers_['cat'].get_feature_names_out().tolist())
         importances = self.model.feature_importances_
         feature_importance = pd.DataFrame({
-            'Feature': feature_names,
+            'Feature': self._feature_names_,
             'Importance': importances
         }).sort_values('Importance', ascending=False)
         
         print("\nTop 10 Most Important Features:")
         print(feature_importance.head(10))
         
+        # Distill the forest into the smaller serving model; predictions come from it,
+        # so its test metrics are the ones returned
+        self.build_serving_model(X_train)
+        y_pred = self.serving_model.predict(X_test)
+        mae = mean_absolute_error(y_test, y_pred)
+        rmse = np.sqrt(mean_squared_error(y_test, y_pred))
+        r2 = r2_score(y_test, y_pred)
+        
+        print(f"\nServing Model Performance:")
+        print(f"MAE: ${mae:,.2f}")
+        print(f"RMSE: ${rmse:,.2f}")
+        print(f"R2 Score: {r2:.3f}")
+        
         return mae, rmse, r2
     
-    def predict(self, property_data):
-        """Predict price for a single property"""
+    def build_serving_model(self, X_processed):
+        """Fit a shallower, smaller forest on the trained forest's predictions for low-latency serving"""
+        if self.model is None:
+            raise ValueError("Model not trained yet!")
+        
+        self.serving_model = RandomForestRegressor(n_estimators=100, max_depth=8, n_jobs=-1, random_state=42)
+        self.serving_model.fit(X_processed, self.model.predict(X_processed))
+        
+        # Fit on all cores, but predict single-threaded: requests are mostly one row, where joblib's
+        # thread dispatch over the shallow trees costs more than it saves
+        self.serving_model.set_params(n_jobs=1)
+        
+        return self.serving_model
+    
+    def predict_batch(self, property_list):
+        """Predict price for a list of properties with one transform and one model call"""
         if self.model is None:
             raise ValueError("Model not trained yet!")
         
-        # Convert single property data to DataFrame
-        X = pd.DataFrame([property_data])
+        # Convert the property dicts to a single DataFrame
+        X = pd.DataFrame(property_list)
         
         # Process features
-        X_processed = self.preprocessor.transform(X)
+        X_processed = self.preprocessor.transform(X).astype(np.float32, copy=False)
+        
+        # Make predictions: through ONNX Runtime when the serving model was exported,
+        # otherwise with the distilled forest when there is one
+        if self._onnx_session is not None:
+            return self._onnx_session.run(None, {'input': X_processed})[0].ravel()
+        # The preprocessor has imputed every missing value, so skip the model's finiteness check
+        model = self.serving_model if self.serving_model is not None else self.model
+        with config_context(assume_finite=True):
+            return model.predict(X_processed)
+    
+    def predict(self, property_data):
+        """Predict price for a single property"""
+        return self.predict_batch([property_data])[0]
+    
+    def export_onnx(self, path='models/price_predictor.onnx'):
+        """Export the serving forest to ONNX and predict through ONNX Runtime from then on"""
+        from skl2onnx import convert_sklearn  # optional: only needed for the ONNX export
+        from skl2onnx.common.data_types import FloatTensorType
         
-        # Make prediction
-        prediction = self.model.predict(X_processed)[0]
+        if self.model is None:
+            raise ValueError("No model to export!")
         
-        return prediction
+        model = self.serving_model if self.serving_model is not None else self.model
+        onnx_model = convert_sklearn(model, initial_types=[('input', FloatTensorType([None, model.n_features_in_]))])
+        with open(path, 'wb') as f:
+            f.write(onnx_model.SerializeToString())
+        self.load_onnx(path)
     
-    def save_model(self, path='models/price_predictor.joblib'):
-        """Save the trained model"""
+    def load_onnx(self, path='models/price_predictor.onnx'):
+        """Serve predictions from an exported ONNX model"""
+        import onnxruntime as ort  # optional: only needed to serve the ONNX export
+        
+        self._onnx_session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+    
+    def save_model(self, path='models/price_predictor.joblib', export_onnx=False):
+        """Save the trained model (export_onnx=True also writes an ONNX copy of the serving model next to it)"""
         if self.model is None:
             raise ValueError("No model to save!")
         
         os.makedirs(os.path.dirname(path), exist_ok=True)
         joblib.dump({
             'model': self.model,
-            'preprocessor': self.preprocessor
-        }, path)
+            'serving_model': self.serving_model,
+            'preprocessor': self.preprocessor,
+            'best_params': self.best_params
+        }, path, compress=('lz4', 3))
+        
+        # Write the ONNX copy, or remove one left over from an earlier model so it can't go stale
+        onnx_path = os.path.splitext(path)[0] + '.onnx'
+        if export_onnx:
+            self.export_onnx(onnx_path)
+        elif os.path.exists(onnx_path):
+            os.remove(onnx_path)
+            self._onnx_session = None
     
     def load_model(self, path='models/price_predictor.joblib'):
         """Load a trained model"""
@@ -138,15 +285,29 @@ class PropertyPricePredictor:
         
         saved_data = joblib.load(path)
         self.model = saved_data['model']
+        self.serving_model = saved_data.get('serving_model')
         self.preprocessor = saved_data['preprocessor']
+        self._feature_names_ = self.preprocessor.get_feature_names_out()
+        self.best_params = saved_data.get('best_params')
+        
+        # Serve from the ONNX copy when one was exported and ONNX Runtime is installed
+        self._onnx_session = None
+        onnx_path = os.path.splitext(path)[0] + '.onnx'
+        if os.path.exists(onnx_path):
+            try:
+                self.load_onnx(onnx_path)
+            except ImportError:
+                pass
 
 class RentPredictor:
     def __init__(self):
         self.model = None
         self.preprocessor = None
+        self._feature_names_ = None  # Output feature names of the fitted preprocessor
         self.feature_columns = None
         self.target_column = 'rent'
-        self.mae = None  # Store MAE for confidence intervals
+        self.mae = DEFAULT_RENT_MAE  # Store MAE for confidence intervals
+        self.best_params = None
         
     def prepare_features(self, df):
         """Prepare features for the rent prediction model"""
@@ -159,7 +320,7 @@ class RentPredictor:
         features = [col for col in features if col in df.columns]
         
         # Create feature matrix
-        X = df[features].copy()
+        X = df[features]
         
         return X
     
@@ -168,26 +329,42 @@ class RentPredictor:
         numeric_features = [col for col in ['FinishedSqft', 'Bedrooms', 'Bathrooms', 'BedBath', 'SqftPerBed', 'LogSqft', 'SaleMonth'] if col in X.columns]
         categorical_features = [col for col in ['nbhd', 'PropertyType', 'zipcode'] if col in X.columns]
         
-        numeric_transformer = Pipeline(steps=[
-            ('imputer', SimpleImputer(strategy='median')),
-            ('scaler', StandardScaler())
-        ])
+        # Trees need no scaling; HistGradientBoosting splits the categories natively, so they are
+        # only ordinal-encoded, with unseen categories as -1 (treated as missing)
+        numeric_transformer = SimpleImputer(strategy='median')
         
         categorical_transformer = Pipeline(steps=[
             ('imputer', SimpleImputer(strategy='most_frequent')),
-            ('onehot', OneHotEncoder(handle_unknown='ignore'))
+            ('ordinal', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1,
+                                       encoded_missing_value=-1, max_categories=255))
         ])
         
         preprocessor = ColumnTransformer(
             transformers=[
                 ('num', numeric_transformer, numeric_features),
                 ('cat', categorical_transformer, categorical_features)
-            ])
+            ],
+            verbose_feature_names_out=False)
         
         return preprocessor
     
-    def train(self, df):
-        """Train the rent prediction model"""
+    @staticmethod
+    def _suggest_params(trial):
+        """HistGradientBoosting search space for tune_hyperparameters"""
+        return {
+            'max_iter': trial.suggest_int('max_iter', 100, 500, step=50),
+            'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.2, log=True),
+            'max_depth': trial.suggest_int('max_depth', 3, 12),
+            'max_leaf_nodes': trial.suggest_int('max_leaf_nodes', 15, 63),
+            'min_samples_leaf': trial.suggest_int('min_samples_leaf', 1, 20),
+            'l2_regularization': trial.suggest_float('l2_regularization', 1e-3, 1.0, log=True)
+        }
+    
+    def train(self, df, tune=False, use_gpu=False):
+        """Train the rent prediction model (tune=True searches hyperparameters first, use_gpu=True trains XGBoost on the GPU)"""
+        if tune and use_gpu:
+            raise ValueError("Hyperparameter search is only supported for the CPU model")
+        
         # Prepare features
         X = self.prepare_features(df)
         y = df[self.target_column]
@@ -195,23 +372,52 @@ class RentPredictor:
         # Create and fit preprocessor
         self.preprocessor = self.create_preprocessor(X)
         X_processed = self.preprocessor.fit_transform(X)
+        self._feature_names_ = self.preprocessor.get_feature_names_out()
         
-        # Split data
+        # Split data, stratified on target deciles (when there are enough rows) so both splits
+        # cover the whole target range
         X_train, X_test, y_train, y_test = train_test_split(
-            X_processed, y, test_size=0.2, random_state=42
+            X_processed, y, test_size=0.2, random_state=42,
+            stratify=target_strata(y)
         )
         
-        # Initialize and train model
-        self.model = GradientBoostingRegressor(
-            n_estimators=300,
-            learning_rate=0.03,
-            max_depth=12,
-            min_samples_split=2,
-            min_samples_leaf=1,
-            random_state=42
-        )
-        
-        self.model.fit(X_train, y_train)
+        if use_gpu:
+            # Histogram XGBoost on the GPU pays off for large data sets; it early-stops on a
+            # slice of the training split so the test split stays untouched
+            from xgboost import XGBRegressor  # only needed for the GPU model
+            
+            self.best_params = {
+                'n_estimators': 300,
+                'learning_rate': 0.03,
+                'max_depth': 8
+            }
+            self.model = XGBRegressor(**self.best_params, tree_method='hist', device='cuda',
+                                      early_stopping_rounds=20, n_jobs=-1, random_state=42)
+            X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.1, random_state=42)
+            self.model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        else:
+            # The preprocessor puts the numeric columns first and the ordinal-encoded categories last
+            n_categorical = len(self.preprocessor.transformers_[1][2])
+            fixed_params = {
+                'categorical_features': np.arange(X_processed.shape[1]) >= X_processed.shape[1] - n_categorical,
+                'early_stopping': True,
+                'validation_fraction': 0.1,
+                'n_iter_no_change': 20,
+                'random_state': 42
+            }
+            
+            # Initialize and train model, searching the hyperparameters on the training split if asked
+            if tune:
+                self.best_params = tune_hyperparameters(HistGradientBoostingRegressor, self._suggest_params,
+                                                        X_train, y_train, **fixed_params)
+            else:
+                self.best_params = {
+                    'max_iter': 300,
+                    'learning_rate': 0.03,
+                    'max_depth': 12
+                }
+            self.model = HistGradientBoostingRegressor(**self.best_params, **fixed_params)
+            self.model.fit(X_train, y_train)
         
         # Evaluate model
         y_pred = self.model.predict(X_test)
@@ -225,11 +431,11 @@ class RentPredictor:
         print(f"R2 Score: {r2:.3f}")
         
         # Print feature importance
-        feature_names = (self.preprocessor.named_transformers_['num'].get_feature_names_out().tolist() +
-                        self.preprocessor.named_transformers_['cat'].get_feature_names_out().tolist())
-        importances = self.model.feature_importances_
+        # HistGradientBoosting has no impurity importances, so permute the held-out features
+        importances = permutation_importance(self.model, X_test, y_test, scoring='neg_mean_absolute_error',
+                                             n_repeats=5, random_state=42, n_jobs=-1).importances_mean
         feature_importance = pd.DataFrame({
-            'Feature': feature_names,
+            'Feature': self._feature_names_,
             'Importance': importances
         }).sort_values('Importance', ascending=False)
         
@@ -238,42 +444,41 @@ class RentPredictor:
         
         return self.mae, rmse, r2
     
-    def predict(self, property_data):
-        """Predict rent for a single property"""
+    def predict_batch(self, property_list):
+        """Predict rent for a list of properties with one transform and one model call"""
         if self.model is None:
             raise ValueError("Model not trained yet!")
         
-        # Convert single property data to DataFrame
-        X = pd.DataFrame([property_data])
+        # Convert the property dicts to a single DataFrame
+        X = pd.DataFrame(property_list)
         
         # Process features
         X_processed = self.preprocessor.transform(X)
         
-        # Make prediction
-        prediction = self.model.predict(X_processed)[0]
-        
-        return prediction
+        # Make predictions
+        return self.model.predict(X_processed)
+    
+    def predict(self, property_data):
+        """Predict rent for a single property"""
+        return self.predict_batch([property_data])[0]
     
     def predict_with_range(self, property_data):
-        """Predict rent with confidence interval based on MAE"""
-        if self.model is None:
-            raise ValueError("Model not trained yet!")
-        
-        prediction = self.predict(property_data)
+        """Predict rent with confidence interval based on MAE (a list of properties gives a list of results)"""
+        is_batch = isinstance(property_data, list)
+        predictions = self.predict_batch(property_data if is_batch else [property_data])
         
-        # Use MAE to create a confidence interval
-        if self.mae is None:
-            self.mae = 289.24  # Default MAE from training if not available
+        # Use MAE to create a confidence interval, with the bounds computed for the whole batch at once
+        lower_bounds = np.maximum(0, predictions - self.mae)
+        upper_bounds = predictions + self.mae
         
-        lower_bound = max(0, prediction - self.mae)
-        upper_bound = prediction + self.mae
-        
-        return {
+        results = [{
             'predicted_rent': prediction,
             'lower_bound': lower_bound,
             'upper_bound': upper_bound,
             'confidence_range': self.mae
-        }
+        } for prediction, lower_bound, upper_bound in zip(predictions, lower_bounds, upper_bounds)]
+        
+        return results if is_batch else results[0]
     
     def save_model(self, path='models/rent_predictor.joblib'):
         """Save the trained model"""
@@ -284,8 +489,9 @@ class RentPredictor:
         joblib.dump({
             'model': self.model,
             'preprocessor': self.preprocessor,
-            'mae': self.mae
-        }, path)
+            'mae': self.mae,
+            'best_params': self.best_params
+        }, path, compress=('lz4', 3))
     
     def load_model(self, path='models/rent_predictor.joblib'):
         """Load a trained model"""
@@ -295,4 +501,6 @@ class RentPredictor:
         saved_data = joblib.load(path)
         self.model = saved_data['model']
         self.preprocessor = saved_data['preprocessor']
-        self.mae = saved_data.get('mae', 289.24)  # Use default MAE if not saved 
\ No newline at end of file
+        self._feature_names_ = self.preprocessor.get_feature_names_out()
+        self.mae = saved_data.get('mae', DEFAULT_RENT_MAE)  # Use default MAE if not saved
+        self.best_params = saved_data.get('best_params') 
\ No newline at end of file
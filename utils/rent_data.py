@@ -0,0 +1,187 @@
+import pandas as pd
+import numpy as np
+import functools
+import importlib.util
+import json
+import os
+import re
+from pathlib import Path
+
+# Bump when _clean changes so stale Parquet caches are rebuilt
+CACHE_VERSION = 5
+
+# Characters stripped from currency strings such as '$1,250'
+CURRENCY_CHARS = str.maketrans('', '', '$,')
+
+# Spreadsheet columns used by the models, renamed to our model's expected format
+COLUMN_MAPPING = {
+    'Neighborhood': 'nbhd',
+    'Rent ($)': 'rent',
+    'Size (ft²)': 'FinishedSqft',
+    '$/ft²': 'price_per_sqft',
+    'Beds': 'Bedrooms',
+    'Baths': 'Bathrooms',
+    'Building Type': 'PropertyType',
+    'Last Seen': 'Sale_date',
+    'Zip-Code': 'zipcode'
+}
+
+# Excel engine for the rent spreadsheet: calamine when pandas supports it (2.2+) and python-calamine
+# is installed, otherwise pandas' default
+EXCEL_ENGINE = ('calamine' if tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2)
+                and importlib.util.find_spec('python_calamine') is not None else None)
+
+# Numeric part of '$/ft²' values such as '0.85/ft²'
+PRICE_PER_SQFT_PATTERN = re.compile(r'([\d\.]+)')
+
+def _extract_price_per_sqft(values):
+    """Parse the number out of each '$/ft²' value in a single pass (NaN when there is none)"""
+    matches = (PRICE_PER_SQFT_PATTERN.search(str(value)) for value in values.to_numpy())
+    return np.fromiter(
+        (float(match.group(1)) if match else np.nan for match in matches),
+        dtype=np.float64, count=len(values)
+    )
+
+def _read_excel(excel_path):
+    """Read only the mapped columns"""
+    return pd.read_excel(excel_path, engine=EXCEL_ENGINE, usecols=lambda col: col in COLUMN_MAPPING)
+
+def _clean(df):
+    """Rename, clean and feature-engineer the raw rent spreadsheet"""
+    print("\nInitial data shape:", df.shape)
+    print("\nOriginal columns:", df.columns.tolist())
+    
+    # Rename columns to match our model's expected format
+    df = df.rename(columns=COLUMN_MAPPING)
+    
+    # Convert numeric columns to proper types
+    numeric_columns = ['rent', 'FinishedSqft', 'price_per_sqft', 'Bedrooms', 'Bathrooms']
+    for col in numeric_columns:
+        if col in df.columns:
+            if col == 'price_per_sqft':
+                # Extract only the numeric part (handles values like '0.85/ft²')
+                df[col] = _extract_price_per_sqft(df[col])
+            elif col == 'rent':
+                # Strip '$' and ',' in a single pass
+                df[col] = pd.to_numeric(df[col].astype(str).str.translate(CURRENCY_CHARS), errors='coerce')
+            else:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    print("\nData Quality Report:")
+    print("\nMissing values per column:")
+    print(df.isnull().sum())
+    
+    print("\nValid entries per column:")
+    print(df.count())
+    
+    # Basic data cleaning - only remove rows where we have no useful data
+    print("\nCleaning data...")
+    print("Rows before cleaning:", len(df))
+    
+    # Keep rows that have at least some useful information
+    # For rent prediction, we need at least rent and some features
+    rent_mask = df['rent'].notna()
+    features_mask = (
+        df['FinishedSqft'].notna() |
+        df['Bedrooms'].notna() |
+        df['Bathrooms'].notna() |
+        df['nbhd'].notna() |
+        df['PropertyType'].notna() |
+        df['zipcode'].notna()
+    )
+    
+    df = df[rent_mask & features_mask]
+    print("Rows after cleaning:", len(df))
+    
+    # Derived columns are computed on the raw arrays and added with a single assign
+    derived = {}
+    
+    # Feature engineering for rent model
+    if 'Bedrooms' in df.columns and 'Bathrooms' in df.columns:
+        derived['BedBath'] = df['Bedrooms'].to_numpy() * df['Bathrooms'].to_numpy()
+    if 'FinishedSqft' in df.columns and 'Bedrooms' in df.columns:
+        bedrooms = df['Bedrooms'].to_numpy(dtype=np.float64)
+        derived['SqftPerBed'] = df['FinishedSqft'].to_numpy() / np.where(bedrooms == 0, np.nan, bedrooms)
+    if 'FinishedSqft' in df.columns:
+        derived['LogSqft'] = np.log1p(df['FinishedSqft'].to_numpy())
+    if 'Sale_date' in df.columns:
+        # Parse dates once (Excel date cells already arrive as datetimes) and take the month from that
+        sale_date = df['Sale_date']
+        if not pd.api.types.is_datetime64_any_dtype(sale_date):
+            sale_date = pd.to_datetime(sale_date, errors='coerce', cache=True)
+        derived['Sale_date'] = sale_date
+        derived['SaleMonth'] = sale_date.dt.month
+    
+    return _downcast(df.assign(**derived))
+
+def _downcast(df):
+    """Shrink the frame: float32 numerics and category dtype for the categoricals"""
+    for col in ['FinishedSqft', 'Bedrooms', 'Bathrooms', 'BedBath', 'SqftPerBed', 'LogSqft',
+                'SaleMonth', 'rent']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast='float')
+    for col in ['nbhd', 'PropertyType', 'zipcode']:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+def _linear_quantiles(values, quantiles):
+    """Linearly interpolated quantiles (as Series.quantile) from a partial partition instead of a sort"""
+    positions = np.asarray(quantiles) * (len(values) - 1)
+    lower = np.floor(positions).astype(int)
+    upper = np.ceil(positions).astype(int)
+    partitioned = np.partition(values, np.union1d(lower, upper))
+    return partitioned[lower] + (partitioned[upper] - partitioned[lower]) * (positions - lower)
+
+def trim_rent_outliers(df):
+    """Keep rents between the 1st and 99th percentiles"""
+    if 'rent' in df.columns:
+        rent = df['rent'].to_numpy(dtype=np.float64)
+        observed = rent[~np.isnan(rent)]
+        if len(observed) == 0:
+            return df.iloc[:0]
+        low, high = _linear_quantiles(observed, [0.01, 0.99])
+        df = df.iloc[np.flatnonzero((rent >= low) & (rent <= high))]
+    return df
+
+def _load_clean_rent_data(excel_path):
+    """Load the cleaned rent data, reusing a Parquet cache while the Excel file is unchanged"""
+    cache_path = os.path.splitext(excel_path)[0] + '.cache.parquet'
+    meta_path = os.path.splitext(excel_path)[0] + '.cache.json'
+    signature = {
+        'mtime': os.path.getmtime(excel_path),
+        'size': os.path.getsize(excel_path),
+        'version': CACHE_VERSION
+    }
+    
+    if os.path.exists(cache_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == signature:
+                print(f"Loading cached data from: {cache_path}")
+                # Parquet does not round-trip every categorical (e.g. integer zip codes)
+                return _downcast(pd.read_parquet(cache_path))
+    
+    # Read the Excel file
+    print(f"Loading data from: {excel_path}")
+    df = _clean(_read_excel(excel_path))
+    
+    try:
+        df.to_parquet(cache_path, compression='zstd')
+        with open(meta_path, 'w') as f:
+            json.dump(signature, f)
+    except Exception as e:
+        print(f"Could not cache cleaned data: {e}")
+    
+    return df
+
+@functools.lru_cache(maxsize=1)
+def load_rent_data(excel_path=None, trim_outliers=True):
+    """Load the cleaned rent training data (memoized, so treat the result as read-only)"""
+    if excel_path is None:
+        # Get the desktop path
+        excel_path = os.path.join(str(Path.home() / "Desktop"), 'Rent Data.xlsx')
+    
+    df = _load_clean_rent_data(excel_path)
+    if trim_outliers:
+        df = trim_rent_outliers(df)
+    return df
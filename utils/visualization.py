@@ -1,5 +1,6 @@
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import pandas as pd
 import numpy as np
 
@@ -16,73 +17,92 @@ MODERN_LAYOUT = dict(
     legend=dict(font=dict(size=16), bgcolor="#f8fafc", bordercolor="#e0e7ef", borderwidth=1),
 )
 
+# The modern layout on top of plotly's default template, built once and reused by every chart
+MODERN_TEMPLATE = go.layout.Template(pio.templates['plotly'])
+MODERN_TEMPLATE.layout.update(MODERN_LAYOUT)
+pio.templates['real_estate'] = MODERN_TEMPLATE
+
+# Most comps create_comps_scatter plots; larger matches are randomly sampled down to this
+MAX_SCATTER_POINTS = 2000
+
+# Placeholder shown by create_comps_scatter when no comps match
+NO_COMPS_ANNOTATION = dict(
+    text="No comparable properties found for the selected criteria.",
+    xref="paper", yref="paper",
+    x=0.5, y=0.5, showarrow=False,
+    font=dict(size=22, color="#e02424"),
+    align="center"
+)
+
 def create_cash_flow_chart(monthly_cash_flow, break_even_rent, current_rent):
     """Create a cash flow analysis chart"""
-    fig = go.Figure()
-    
-    # Add cash flow line
-    fig.add_trace(go.Scatter(
-        x=[current_rent],
-        y=[monthly_cash_flow],
-        mode='markers+lines',
-        name='Cash Flow',
-        line=dict(color=COLOR_SEQ[0], width=4),
-        marker=dict(size=14)
-    ))
-    
-    # Add break-even point
-    fig.add_trace(go.Scatter(
-        x=[break_even_rent],
-        y=[0],
-        mode='markers',
-        name='Break-even Point',
-        marker=dict(color=COLOR_SEQ[1], size=18, symbol='diamond')
-    ))
-    
-    fig.update_layout(
-        title='Cash Flow vs Rent',
-        xaxis_title='Monthly Rent ($)',
-        yaxis_title='Monthly Cash Flow ($)',
-        showlegend=True,
-        **MODERN_LAYOUT
+    # Build the figure from its traces and layout in one go
+    fig = go.Figure(
+        data=[
+            # Cash flow line
+            go.Scatter(
+                x=[current_rent],
+                y=[monthly_cash_flow],
+                mode='markers+lines',
+                name='Cash Flow',
+                line=dict(color=COLOR_SEQ[0], width=4),
+                marker=dict(size=14)
+            ),
+            # Break-even point
+            go.Scatter(
+                x=[break_even_rent],
+                y=[0],
+                mode='markers',
+                name='Break-even Point',
+                marker=dict(color=COLOR_SEQ[1], size=18, symbol='diamond')
+            )
+        ],
+        layout=go.Layout(
+            title='Cash Flow vs Rent',
+            xaxis_title='Monthly Rent ($)',
+            yaxis_title='Monthly Cash Flow ($)',
+            showlegend=True,
+            template=MODERN_TEMPLATE
+        )
     )
     
     return fig
 
 def create_roi_comparison_chart(property_metrics, market_average):
     """Create ROI comparison chart"""
-    fig = go.Figure()
-    
-    # Add property metrics
-    fig.add_trace(go.Bar(
-        x=['Cap Rate', 'Cash on Cash', 'ROI'],
-        y=[
-            property_metrics['cap_rate'],
-            property_metrics['cash_on_cash'],
-            property_metrics['roi']
-        ],
-        name='Property',
-        marker_color=COLOR_SEQ[0]
-    ))
-    
-    # Add market averages
-    fig.add_trace(go.Bar(
-        x=['Cap Rate', 'Cash on Cash', 'ROI'],
-        y=[
-            market_average['cap_rate'],
-            market_average['cash_on_cash'],
-            market_average['roi']
+    metrics = ['Cap Rate', 'Cash on Cash', 'ROI']
+    fig = go.Figure(
+        data=[
+            # Property metrics
+            go.Bar(
+                x=metrics,
+                y=[
+                    property_metrics['cap_rate'],
+                    property_metrics['cash_on_cash'],
+                    property_metrics['roi']
+                ],
+                name='Property',
+                marker_color=COLOR_SEQ[0]
+            ),
+            # Market averages
+            go.Bar(
+                x=metrics,
+                y=[
+                    market_average['cap_rate'],
+                    market_average['cash_on_cash'],
+                    market_average['roi']
+                ],
+                name='Market Average',
+                marker_color=COLOR_SEQ[1]
+            )
         ],
-        name='Market Average',
-        marker_color=COLOR_SEQ[1]
-    ))
-    
-    fig.update_layout(
-        title='Investment Metrics vs Market Average',
-        xaxis_title='Metric',
-        yaxis_title='Percentage (%)',
-        barmode='group',
-        **MODERN_LAYOUT
+        layout=go.Layout(
+            title='Investment Metrics vs Market Average',
+            xaxis_title='Metric',
+            yaxis_title='Percentage (%)',
+            barmode='group',
+            template=MODERN_TEMPLATE
+        )
     )
     
     return fig
@@ -97,38 +117,38 @@ def create_expense_breakdown_chart(annual_expenses):
         hole=0.35
     )
     fig.update_traces(textinfo='percent+label', textfont_size=18, pull=[0.05]*len(annual_expenses))
-    fig.update_layout(**MODERN_LAYOUT)
+    fig.update_layout(template=MODERN_TEMPLATE)
     return fig
 
 def create_property_value_trend(historical_values, predicted_value):
     """Create property value trend chart"""
-    fig = go.Figure()
-    
-    # Add historical values
-    fig.add_trace(go.Scatter(
-        x=historical_values.index,
-        y=historical_values.values,
-        mode='lines+markers',
-        name='Historical Values',
-        line=dict(color=COLOR_SEQ[0], width=4),
-        marker=dict(size=10)
-    ))
-    
-    # Add predicted value
-    fig.add_trace(go.Scatter(
-        x=[historical_values.index[-1]],
-        y=[predicted_value],
-        mode='markers',
-        name='Predicted Value',
-        marker=dict(color=COLOR_SEQ[1], size=18, symbol='star')
-    ))
-    
-    fig.update_layout(
-        title='Property Value Trend',
-        xaxis_title='Date',
-        yaxis_title='Value ($)',
-        showlegend=True,
-        **MODERN_LAYOUT
+    fig = go.Figure(
+        data=[
+            # Historical values
+            go.Scatter(
+                x=historical_values.index,
+                y=historical_values.values,
+                mode='lines+markers',
+                name='Historical Values',
+                line=dict(color=COLOR_SEQ[0], width=4),
+                marker=dict(size=10)
+            ),
+            # Predicted value
+            go.Scatter(
+                x=[historical_values.index[-1]],
+                y=[predicted_value],
+                mode='markers',
+                name='Predicted Value',
+                marker=dict(color=COLOR_SEQ[1], size=18, symbol='star')
+            )
+        ],
+        layout=go.Layout(
+            title='Property Value Trend',
+            xaxis_title='Date',
+            yaxis_title='Value ($)',
+            showlegend=True,
+            template=MODERN_TEMPLATE
+        )
     )
     
     return fig
@@ -143,7 +163,7 @@ def create_risk_heatmap(foreclosure_data):
         title='Foreclosure Risk Heatmap',
         color_continuous_scale='Viridis'
     )
-    fig.update_layout(**MODERN_LAYOUT)
+    fig.update_layout(template=MODERN_TEMPLATE)
     return fig
 
 def create_comps_scatter(property_data, comps_data):
@@ -162,63 +182,65 @@ def create_comps_scatter(property_data, comps_data):
     sqft_col = 'sqft' if 'sqft' in comps_data.columns else 'FinishedSqft' if 'FinishedSqft' in comps_data.columns else None
     price_col = 'price' if 'price' in comps_data.columns else 'Sale_price' if 'Sale_price' in comps_data.columns else None
 
-    filtered = comps_data.copy()
+    # Build one boolean mask over the column arrays instead of filtering the frame step by step
+    mask = np.ones(len(comps_data), dtype=bool)
     # Filter by zip code
     if zip_col and target_zip:
-        filtered = filtered[filtered[zip_col] == target_zip]
+        mask &= (comps_data[zip_col] == target_zip).to_numpy(dtype=bool)
     # Filter by similar beds (+/-1)
     if beds_col and target_beds is not None:
-        filtered = filtered[(filtered[beds_col] >= target_beds - 1) & (filtered[beds_col] <= target_beds + 1)]
+        beds = comps_data[beds_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        mask &= (beds >= target_beds - 1) & (beds <= target_beds + 1)
     # Filter by similar baths (+/-1)
     if baths_col and target_baths is not None:
-        filtered = filtered[(filtered[baths_col] >= target_baths - 1) & (filtered[baths_col] <= target_baths + 1)]
+        baths = comps_data[baths_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        mask &= (baths >= target_baths - 1) & (baths <= target_baths + 1)
+    sqfts = comps_data[sqft_col].to_numpy(dtype=np.float64, na_value=np.nan) if sqft_col else None
     # Filter by similar sqft (+/-20%)
     if sqft_col and target_sqft is not None:
-        filtered = filtered[(filtered[sqft_col] >= target_sqft * 0.8) & (filtered[sqft_col] <= target_sqft * 1.2)]
-    # Remove outliers (1st–99th percentile)
-    if price_col and sqft_col and not filtered.empty:
-        price_low = np.percentile(filtered[price_col], 1)
-        sqft_low = np.percentile(filtered[sqft_col], 1)
-        filtered = filtered[(filtered[price_col] >= price_low) & (filtered[price_col] <= 800000) &
-                            (filtered[sqft_col] >= sqft_low) & (filtered[sqft_col] <= 6000)]
-    fig = go.Figure()
-    # Add comparable properties
-    if not filtered.empty and price_col and sqft_col:
-        fig.add_trace(go.Scatter(
+        mask &= (sqfts >= target_sqft * 0.8) & (sqfts <= target_sqft * 1.2)
+    # Remove outliers (1st percentile of the remaining comps up to fixed caps)
+    if price_col and sqft_col and mask.any():
+        prices = comps_data[price_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        # Both cutoffs from one partition-based percentile over a contiguous 2 x n block
+        price_low, sqft_low = np.percentile(np.stack([prices[mask], sqfts[mask]]), 1, axis=1)
+        mask &= (prices >= price_low) & (prices <= 800000) & (sqfts >= sqft_low) & (sqfts <= 6000)
+    filtered = comps_data[mask]
+    # Keep the plot (and the JSON sent to the browser) small for large comp sets
+    if len(filtered) > MAX_SCATTER_POINTS:
+        filtered = filtered.sample(n=MAX_SCATTER_POINTS, random_state=0)
+    has_comps = bool(not filtered.empty and price_col and sqft_col)
+    traces = []
+    # Comparable properties
+    if has_comps:
+        traces.append(go.Scatter(
             x=filtered[sqft_col],
             y=filtered[price_col],
             mode='markers',
             name='Comparable Properties',
             marker=dict(color=COLOR_SEQ[0], opacity=0.7, size=9, line=dict(width=0.5, color='#223'))
         ))
-    # Add target property
+    # Target property
     if target_sqft is not None and target_price is not None:
-        fig.add_trace(go.Scatter(
+        traces.append(go.Scatter(
             x=[target_sqft],
             y=[target_price],
             mode='markers',
             name='Target Property',
             marker=dict(color=COLOR_SEQ[1], size=22, line=dict(width=2, color='#223'), symbol='star')
         ))
-    fig.update_layout(
-        title='Comparable Properties Analysis',
-        xaxis_title='Square Footage',
-        yaxis_title='Price ($)',
-        showlegend=True,
-        xaxis=dict(tickangle=30, tickfont=dict(size=16)),
-        yaxis=dict(tickfont=dict(size=16)),
-        **MODERN_LAYOUT
-    )
-    # If no comps, show a message
-    if filtered.empty or not price_col or not sqft_col:
-        fig.add_annotation(
-            text="No comparable properties found for the selected criteria.",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=22, color="#e02424"),
-            align="center"
+    # If no comps, show a message and hide the axes
+    fig = go.Figure(
+        data=traces,
+        layout=go.Layout(
+            title='Comparable Properties Analysis',
+            xaxis_title='Square Footage',
+            yaxis_title='Price ($)',
+            showlegend=has_comps,
+            xaxis=dict(tickangle=30, tickfont=dict(size=16), visible=has_comps),
+            yaxis=dict(tickfont=dict(size=16), visible=has_comps),
+            annotations=[] if has_comps else [NO_COMPS_ANNOTATION],
+            template=MODERN_TEMPLATE
         )
-        fig.update_xaxes(visible=False)
-        fig.update_yaxes(visible=False)
-        fig.update_layout(showlegend=False)
-    return fig 
\ No newline at end of file
+    )
+    return fig